@@ -1,8 +1,14 @@
+from __future__ import annotations
+
+import asyncio
 import os
-import json
+import dataclasses
 import datetime
-import uuid
+import functools
+import secrets
+import types
 import zoneinfo
+import orjson
 import astrbot.api.star as star
 from astrbot.api.event import filter
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -11,6 +17,64 @@ from astrbot.api import llm_tool, logger
 from astrbot.core.utils.astrbot_path import get_astrbot_data_path
 from astrbot.api.star import register # Import register
 
+
+# Platforms the LLM tools refuse to serve.
+_BLOCKED_PLATFORMS = frozenset({"qq_official"})
+
+
+def _parse_dt(s: str) -> datetime.datetime:
+    """Parse a '%Y-%m-%d %H:%M' string without the strptime machinery."""
+    try:
+        return datetime.datetime(
+            int(s[:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]), int(s[14:16])
+        )
+    except (ValueError, IndexError):
+        raise ValueError(f"无效的时间格式: {s!r}，应为 %Y-%m-%d %H:%M。") from None
+
+
+@dataclasses.dataclass(slots=True)
+class Reminder:
+    """A single reminder; the fixed schema is kept compact with __slots__."""
+
+    text: str
+    id: str
+    datetime: str | None = None
+    cron: str | None = None
+    cron_h: str | None = None
+    # Runtime-only caches, never written to disk.
+    _dt: datetime.datetime | None = None
+    _display: str = ""
+
+    def to_dict(self) -> dict:
+        """Serializable form; runtime-only fields are dropped."""
+        out = {"text": self.text, "id": self.id}
+        if self.datetime is not None:
+            out["datetime"] = self.datetime
+        if self.cron is not None:
+            out["cron"] = self.cron
+            out["cron_h"] = self.cron_h
+        return out
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_cron_expr(cron_expr: str):
+    """Parse a 5-field cron expression into APScheduler kwargs.
+
+    Cached because the same expressions are re-parsed on every load and add.
+    """
+    fields = cron_expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"无效的 Cron 表达式: {cron_expr}，应为 5 个字段。")
+    return types.MappingProxyType(
+        {
+            "minute": fields[0],
+            "hour": fields[1],
+            "day": fields[2],
+            "month": fields[3],
+            "day_of_week": fields[4],
+        }
+    )
+
 @register("astrbot_plugin_reminder", "Soulter", "增强型待办提醒，支持批量添加和智能日程规划。", "0.0.1")
 class Main(star.Star):
     """增强型待办提醒，支持批量添加和智能日程规划。"""
@@ -28,119 +92,208 @@ class Main(star.Star):
         self.scheduler = AsyncIOScheduler(timezone=self.timezone)
 
         # set and load config
-        reminder_file = os.path.join(get_astrbot_data_path(), "astrbot-reminder.json")
-        if not os.path.exists(reminder_file):
-            with open(reminder_file, "w", encoding="utf-8") as f:
+        self._reminder_file = os.path.join(
+            get_astrbot_data_path(), "astrbot-reminder.json"
+        )
+        if not os.path.exists(self._reminder_file):
+            with open(self._reminder_file, "w", encoding="utf-8") as f:
                 f.write("{}")
-        with open(reminder_file, "r", encoding="utf-8") as f:
-            self.reminder_data = json.load(f)
+        with open(self._reminder_file, "rb") as f:
+            raw = orjson.loads(f.read())
 
-        self._init_scheduler()
-        self.scheduler.start()
+        self._dirty = False
+        self._flush_handle = None
+        self._flush_future = None
+        self._by_id: dict[str, tuple[str, Reminder]] = {}
+        self.reminder_data: dict[str, dict[str, list[Reminder]]] = {}
 
-    def _init_scheduler(self):
-        """Initialize the scheduler."""
-        for group in self.reminder_data:
-            for reminder in self.reminder_data[group]:
-                if "id" not in reminder:
-                    id_ = str(uuid.uuid4())
-                    reminder["id"] = id_
-                else:
-                    id_ = reminder["id"]
+        self._init_scheduler(raw)
+        self.scheduler.start()
 
-                if "datetime" in reminder:
-                    if self.check_is_outdated(reminder):
-                        continue
+    @staticmethod
+    def _display_time(reminder: Reminder) -> str:
+        """Build the human-facing time string shown when a reminder fires."""
+        if reminder.datetime is not None:
+            return reminder.datetime
+        if reminder.cron_h:
+            return f"{reminder.cron_h}(Cron: {reminder.cron})"
+        return f"Cron: {reminder.cron}"
+
+    @staticmethod
+    def _new_id() -> str:
+        """Generate a job id; shorter than a UUID but still unguessable."""
+        return secrets.token_hex(8)
+
+    def _init_scheduler(self, raw: dict):
+        """Build reminder_data, the id index and all jobs in a single pass."""
+        now = datetime.datetime.now(self.timezone)
+        for group, loaded in raw.items():
+            if isinstance(loaded, list):
+                # Legacy flat layout; rewrite in bucket form on next flush.
+                entries = loaded
+                self._dirty = True
+            else:
+                entries = loaded["dates"] + loaded["crons"]
+            buckets = {"dates": [], "crons": []}
+            self.reminder_data[group] = buckets
+            for entry in entries:
+                reminder = Reminder(
+                    text=entry.get("text", ""),
+                    id=entry.get("id") or self._new_id(),
+                    datetime=entry.get("datetime"),
+                    cron=entry.get("cron"),
+                    cron_h=entry.get("cron_h"),
+                )
+                id_ = reminder.id
+                reminder._display = self._display_time(reminder)
+                if reminder.cron is not None:
+                    buckets["crons"].append(reminder)
+                    self._by_id[id_] = (group, reminder)
                     self.scheduler.add_job(
                         self._reminder_callback,
+                        trigger="cron",
                         id=id_,
-                        trigger="date",
                         args=[group, reminder],
-                        run_date=datetime.datetime.strptime(
-                            reminder["datetime"], "%Y-%m-%d %H:%M"
-                        ),
                         misfire_grace_time=60,
+                        **_parse_cron_expr(reminder.cron),
                     )
-                elif "cron" in reminder:
+                elif reminder.datetime is None:
+                    # Neither cron nor datetime — nothing to schedule; prune
+                    # the row instead of failing the whole load.
+                    logger.warning(
+                        f"跳过无时间信息的待办事项: {reminder.text!r} (id={id_})"
+                    )
+                    self._dirty = True
+                else:
+                    dt = self._get_reminder_dt(reminder)
+                    if dt < now:
+                        self._dirty = True
+                        continue
+                    buckets["dates"].append(reminder)
+                    self._by_id[id_] = (group, reminder)
                     self.scheduler.add_job(
                         self._reminder_callback,
-                        trigger="cron",
                         id=id_,
+                        trigger="date",
                         args=[group, reminder],
+                        run_date=dt,
                         misfire_grace_time=60,
-                        **self._parse_cron_expr(reminder["cron"]),
                     )
 
-    def check_is_outdated(self, reminder: dict):
-        """Check if the reminder is outdated."""
-        if "datetime" in reminder:
-            reminder_time = datetime.datetime.strptime(
-                reminder["datetime"], "%Y-%m-%d %H:%M"
-            ).replace(tzinfo=self.timezone)
-            return reminder_time < datetime.datetime.now(self.timezone)
-        return False
+    def _get_reminder_dt(self, reminder: Reminder):
+        """Return the aware datetime of a date reminder, parsing it only once."""
+        dt = reminder._dt
+        if dt is None:
+            dt = _parse_dt(reminder.datetime).replace(tzinfo=self.timezone)
+            reminder._dt = dt
+        return dt
 
     async def _save_data(self):
-        """Save the reminder data."""
-        reminder_file = os.path.join(get_astrbot_data_path(), "astrbot-reminder.json")
-        with open(reminder_file, "w", encoding="utf-8") as f:
-            json.dump(self.reminder_data, f, ensure_ascii=False)
-
-    def _parse_cron_expr(self, cron_expr: str):
-        fields = cron_expr.split(" ")
+        """Mark the reminder data dirty and schedule a coalesced flush."""
+        self._dirty = True
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(0.5, self._do_flush)
+
+    def _do_flush(self):
+        """Snapshot the store and hand the blocking write to a worker thread."""
+        self._flush_handle = None
+        if not self._dirty:
+            return
+        if self._flush_future is not None:
+            # A write is still in flight; leave _dirty set and retry once it
+            # finishes so two threads never target the same tmp file.
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                0.5, self._do_flush
+            )
+            return
+        self._dirty = False
+        # Snapshot on the loop thread; the worker must not iterate the live
+        # store while handlers keep mutating it.
+        payload = self._build_payload()
+        self._flush_future = asyncio.get_running_loop().run_in_executor(
+            None, self._write_file_sync, payload
+        )
+        self._flush_future.add_done_callback(self._on_flush_done)
+
+    def _on_flush_done(self, future):
+        if future is self._flush_future:
+            self._flush_future = None
+        exc = future.exception()
+        if exc is not None:
+            logger.error(f"Reminder store flush failed: {exc}")
+            # Keep the data marked dirty so the next save retries the write.
+            self._dirty = True
+
+    def _build_payload(self) -> dict:
+        """Build the serializable snapshot of the reminder data."""
         return {
-            "minute": fields[0],
-            "hour": fields[1],
-            "day": fields[2],
-            "month": fields[3],
-            "day_of_week": fields[4],
+            origin: {
+                key: [reminder.to_dict() for reminder in bucket]
+                for key, bucket in buckets.items()
+            }
+            for origin, buckets in self.reminder_data.items()
         }
 
+    def _write_file_sync(self, payload: dict):
+        """Serialize and atomically write a payload snapshot (blocking)."""
+        tmp_file = self._reminder_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(orjson.dumps(payload))
+        os.replace(tmp_file, self._reminder_file)
+
     async def _add_single_reminder(self, unified_msg_origin: str, text: str, datetime_str: str = None, cron_expression: str = None, human_readable_cron: str = None):
         """Helper function to add a single reminder."""
-        if unified_msg_origin not in self.reminder_data:
-            self.reminder_data[unified_msg_origin] = []
+        buckets = self.reminder_data.setdefault(
+            unified_msg_origin, {"dates": [], "crons": []}
+        )
 
         if not cron_expression and not datetime_str:
             raise ValueError(
                 "The cron_expression and datetime_str cannot be both None."
             )
-        
+
+        # Validate up front so a malformed expression raises before any
+        # state (store, id index, jobstore) has been touched.
+        cron_fields = _parse_cron_expr(cron_expression) if cron_expression else None
+
         if not text:
             text = "未命名待办事项"
 
-        d = {"text": text, "id": str(uuid.uuid4())}
+        d = Reminder(text=text, id=self._new_id())
         reminder_time_display = ""
 
         if cron_expression:
-            d["cron"] = cron_expression
-            d["cron_h"] = human_readable_cron
-            self.reminder_data[unified_msg_origin].append(d)
+            d.cron = cron_expression
+            d.cron_h = human_readable_cron
+            d._display = self._display_time(d)
+            buckets["crons"].append(d)
             self.scheduler.add_job(
                 self._reminder_callback,
                 "cron",
-                id=d["id"],
+                id=d.id,
                 misfire_grace_time=60,
-                **self._parse_cron_expr(cron_expression),
+                **cron_fields,
                 args=[unified_msg_origin, d],
             )
             if human_readable_cron:
                 reminder_time_display = f"{human_readable_cron}(Cron: {cron_expression})"
         else:
-            d["datetime"] = datetime_str
-            self.reminder_data[unified_msg_origin].append(d)
-            datetime_scheduled = datetime.datetime.strptime(
-                datetime_str, "%Y-%m-%d %H:%M"
-            )
+            d.datetime = datetime_str
+            datetime_scheduled = _parse_dt(datetime_str)
+            d._dt = datetime_scheduled.replace(tzinfo=self.timezone)
+            d._display = datetime_str
+            buckets["dates"].append(d)
             self.scheduler.add_job(
                 self._reminder_callback,
                 "date",
-                id=d["id"],
+                id=d.id,
                 args=[unified_msg_origin, d],
                 run_date=datetime_scheduled,
                 misfire_grace_time=60,
             )
             reminder_time_display = datetime_str
+        self._by_id[d.id] = (unified_msg_origin, d)
         return text, reminder_time_display
 
     @llm_tool("astrbot_plugin_reminder")
@@ -160,7 +313,7 @@ class Main(star.Star):
             cron_expression(string): Required when user's reminder is a repeated reminder. The cron expression of the reminder. Monday is 0 and Sunday is 6.
             human_readable_cron(string): Optional. The human readable cron expression of the reminder.
         """
-        if event.get_platform_name() == "qq_official":
+        if event.get_platform_name() in _BLOCKED_PLATFORMS:
             yield event.plain_result("reminder 暂不支持 QQ 官方机器人。")
             return
         
@@ -192,24 +345,30 @@ class Main(star.Star):
                             Example: [{"text": "Buy groceries", "datetime_str": "2025-07-29 10:00"},
                                       {"text": "Call mom", "cron_expression": "0 9 * * 1", "human_readable_cron": "Every Monday at 9 AM"}]
         """
-        if event.get_platform_name() == "qq_official":
+        if event.get_platform_name() in _BLOCKED_PLATFORMS:
             yield event.plain_result("reminder 暂不支持 QQ 官方机器人。")
             return
 
         results = []
-        for r in reminders:
-            try:
-                text_display, time_display = await self._add_single_reminder(
-                    event.unified_msg_origin,
-                    r.get("text"),
-                    r.get("datetime_str"),
-                    r.get("cron_expression"),
-                    r.get("human_readable_cron")
-                )
-                results.append(f"成功设置: {text_display} - {time_display}")
-            except ValueError as e:
-                results.append(f"设置失败 ({r.get('text', '未知事项')}): {e}")
-        
+        # Pause the scheduler while adding so it wakes up once for the whole
+        # batch instead of recomputing its next fire time per add.
+        self.scheduler.pause()
+        try:
+            for r in reminders:
+                try:
+                    text_display, time_display = await self._add_single_reminder(
+                        event.unified_msg_origin,
+                        r.get("text"),
+                        r.get("datetime_str"),
+                        r.get("cron_expression"),
+                        r.get("human_readable_cron")
+                    )
+                    results.append(f"成功设置: {text_display} - {time_display}")
+                except ValueError as e:
+                    results.append(f"设置失败 ({r.get('text', '未知事项')}): {e}")
+        finally:
+            self.scheduler.resume()
+
         await self._save_data()
         yield event.plain_result(
             "批量设置待办事项完成:\n"
@@ -229,7 +388,7 @@ class Main(star.Star):
         Args:
             user_request(string): Must Required. The user's request for schedule planning.
         """
-        if event.get_platform_name() == "qq_official":
+        if event.get_platform_name() in _BLOCKED_PLATFORMS:
             yield event.plain_result("reminder 暂不支持 QQ 官方机器人。")
             return
 
@@ -292,20 +451,15 @@ class Main(star.Star):
 
     async def get_upcoming_reminders(self, unified_msg_origin: str):
         """Get upcoming reminders."""
-        reminders = self.reminder_data.get(unified_msg_origin, [])
-        if not reminders:
+        buckets = self.reminder_data.get(unified_msg_origin)
+        if not buckets:
             return []
         now = datetime.datetime.now(self.timezone)
-        upcoming_reminders = [
-            reminder
-            for reminder in reminders
-            if "datetime" not in reminder
-            or datetime.datetime.strptime(
-                reminder["datetime"], "%Y-%m-%d %H:%M"
-            ).replace(tzinfo=self.timezone)
-            >= now
+        # Every date reminder carries a pre-parsed, tz-aware _dt (set on load
+        # and on add), so this is a pure comparison per element.
+        return buckets["crons"] + [
+            reminder for reminder in buckets["dates"] if reminder._dt >= now
         ]
-        return upcoming_reminders
 
     @reminder.command("ls")
     async def reminder_ls(self, event: AstrMessageEvent):
@@ -316,11 +470,7 @@ class Main(star.Star):
         else:
             reminder_str = "正在进行的待办事项：\n"
             for i, reminder in enumerate(reminders):
-                time_ = reminder.get("datetime", "")
-                if not time_:
-                    cron_expr = reminder.get("cron", "")
-                    time_ = reminder.get("cron_h", "") + f"(Cron: {cron_expr})"
-                reminder_str += f"{i + 1}. {reminder['text']} - {time_}\n"
+                reminder_str += f"{i + 1}. {reminder.text} - {reminder._display}\n"
             reminder_str += "\n使用 /reminder rm <id> 删除待办事项。\n"
             yield event.plain_result(reminder_str)
 
@@ -334,14 +484,18 @@ class Main(star.Star):
         elif index < 1 or index > len(reminders):
             yield event.plain_result("索引越界。")
         else:
-            reminder = reminders.pop(index - 1)
-            job_id = reminder.get("id")
-
-            # self.reminder_data[event.unified_msg_origin] = reminder
-            users_reminders = self.reminder_data.get(event.unified_msg_origin, [])
-            for i, r in enumerate(users_reminders):
-                if r.get("id") == job_id:
-                    users_reminders.pop(i)
+            # get_upcoming_reminders returns a fresh list, so index into it
+            # rather than popping — the pop only mutated the throwaway copy.
+            reminder = reminders[index - 1]
+            job_id = reminder.id
+
+            entry = self._by_id.pop(job_id, None)
+            if entry is not None:
+                origin, stored = entry
+                bucket = self.reminder_data[origin][
+                    "crons" if stored.cron is not None else "dates"
+                ]
+                bucket.remove(stored)
 
             try:
                 self.scheduler.remove_job(job_id)
@@ -351,23 +505,34 @@ class Main(star.Star):
                     f"成功移除对应的待办事项。删除定时任务失败: {str(e)} 可能需要重启 AstrBot 以取消该提醒任务。"
                 )
             await self._save_data()
-            yield event.plain_result("成功删除待办事项：\n" + reminder["text"])
+            yield event.plain_result("成功删除待办事项：\n" + reminder.text)
 
-    async def _reminder_callback(self, unified_msg_origin: str, d: dict):
+    async def _reminder_callback(self, unified_msg_origin: str, d: Reminder):
         """The callback function of the reminder."""
-        logger.info(f"Reminder Activated: {d['text']}, created by {unified_msg_origin}")
+        logger.info(f"Reminder Activated: {d.text}, created by {unified_msg_origin}")
         await self.context.send_message(
             unified_msg_origin,
             MessageEventResult().message(
                 "待办提醒: \n\n"
-                + d["text"]
+                + d.text
                 + "\n时间: "
-                + d.get("datetime", "")
-                + d.get("cron_h", "")
+                + d._display
             ),
         )
 
     async def terminate(self):
         self.scheduler.shutdown()
-        await self._save_data()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_future is not None:
+            # Wait out any in-flight executor write so the final flush below
+            # doesn't race it on the same tmp file.
+            try:
+                await self._flush_future
+            except Exception:
+                pass  # already logged by _on_flush_done
+            self._flush_future = None
+        self._dirty = False
+        self._write_file_sync(self._build_payload())
         logger.info("Reminder plugin terminated.")